@@ -3,6 +3,7 @@
 
 import os
 import logging
+import threading
 from typing import Callable
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -11,6 +12,7 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from config.settings import config
 from routes.views import gallery_bp
 from utils.image_processing import scan_and_generate_all_thumbnails
+from utils.scan_cache import scan_cache
 
 
 def create_app() -> Flask:
@@ -19,7 +21,7 @@ def create_app() -> Flask:
     
     # Configure logging
     logging.basicConfig(
-        level=logging.INFO,
+        level=config.get('LOG_LEVEL', 'INFO'),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler('pygallery.log'),
@@ -27,6 +29,9 @@ def create_app() -> Flask:
         ]
     )
     
+    # Let Apache/lighttpd send file contents (see SENDFILE_MODE in config.ini)
+    app.config['USE_X_SENDFILE'] = config.get('SENDFILE_MODE') == 'x-sendfile'
+
     # Apply ProxyFix to the Flask application
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1, x_prefix=1, x_proto=1)
     
@@ -45,9 +50,15 @@ thumbnails_dir = config.get('THUMBNAILS_DIR')
 photos_dir.mkdir(parents=True, exist_ok=True)
 thumbnails_dir.mkdir(parents=True, exist_ok=True)
 
-# Generate thumbnails at startup (runs once when gunicorn loads the module)
-with app.test_request_context():
-    scan_and_generate_all_thumbnails()
+# Restore directory listings saved by a previous run
+scan_cache.load()
+
+# Generate thumbnails at startup (runs once when gunicorn loads the module).
+# The scan runs in the background so requests are served right away: any
+# thumbnail it has not reached yet is generated on first request instead,
+# which is also what happens when pregeneration is disabled.
+if config.get('PREGENERATE_THUMBNAILS'):
+    threading.Thread(target=scan_and_generate_all_thumbnails, name='thumbnail-scan', daemon=True).start()
 
 
 def main() -> None:
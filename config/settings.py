@@ -34,10 +34,46 @@ class Config:
             self.app_config['THUMBNAILS_DIR'] = Path(config['Gallery'].get('THUMBNAILS_DIR', './thumbnails')).resolve()
             self.app_config['THUMBNAIL_SIZE'] = tuple(map(int, config['Gallery'].get('THUMBNAIL_SIZE', '200,200').split(',')))
             self.app_config['PORT'] = int(config['Gallery'].get('PORT', '5000'))
+            self.app_config['LOG_LEVEL'] = config['Gallery'].get('LOG_LEVEL', 'INFO').strip().upper()
+            self.app_config['THUMBNAIL_BACKEND'] = config['Gallery'].get('THUMBNAIL_BACKEND', 'auto').strip().lower()
+            scan_cache_file = config['Gallery'].get('SCAN_CACHE_FILE', str(self.app_config['THUMBNAILS_DIR'] / '.scan_cache.json'))
+            self.app_config['SCAN_CACHE_FILE'] = Path(scan_cache_file).resolve() if scan_cache_file else None
+            self.app_config['CACHE_MAX_AGE'] = int(config['Gallery'].get('CACHE_MAX_AGE', '86400'))
+            self.app_config['SENDFILE_MODE'] = config['Gallery'].get('SENDFILE_MODE', 'none').strip().lower()
+            self.app_config['ACCEL_REDIRECT_PREFIX'] = config['Gallery'].get('ACCEL_REDIRECT_PREFIX', '/_protected').rstrip('/')
+            self.app_config['PREGENERATE_THUMBNAILS'] = config['Gallery'].getboolean('PREGENERATE_THUMBNAILS', True)
+            self.app_config['SCAN_THREADS'] = int(config['Gallery'].get('SCAN_THREADS', '8'))
+            self.app_config['EXCLUDE_DIRS'] = frozenset(name.strip() for name in config['Gallery'].get('EXCLUDE_DIRS', '@eaDir,#recycle,#snapshot,__pycache__').split(',') if name.strip())
+            self.app_config['THUMBNAIL_FORMAT'] = config['Gallery'].get('THUMBNAIL_FORMAT', 'webp').strip().lower()
+            self.app_config['ALBUM_SPRITES'] = config['Gallery'].getboolean('ALBUM_SPRITES', False)
+            self.app_config['WORKERS'] = int(config['Gallery'].get('WORKERS', str(os.cpu_count() or 1)))
+            self.app_config['THUMBNAIL_CONCURRENCY'] = max(1, int(config['Gallery'].get('THUMBNAIL_CONCURRENCY', str(max(2, (os.cpu_count() or 1) // 2)))))
         except ValueError as e:
             print(f"Error parsing configuration: {e}")
             exit(1)
 
+        if self.app_config['THUMBNAIL_BACKEND'] not in ('auto', 'pil', 'vips'):
+            print(f"Error: THUMBNAIL_BACKEND must be 'auto', 'pil' or 'vips', got '{self.app_config['THUMBNAIL_BACKEND']}'.")
+            exit(1)
+
+        if self.app_config['THUMBNAIL_FORMAT'] not in ('webp', 'avif', 'jpeg', 'original'):
+            print(f"Error: THUMBNAIL_FORMAT must be 'webp', 'avif', 'jpeg' or 'original', got '{self.app_config['THUMBNAIL_FORMAT']}'.")
+            exit(1)
+
+        if self.app_config['THUMBNAIL_FORMAT'] == 'avif':
+            from PIL import features
+            if not features.check('avif'):
+                print("Error: THUMBNAIL_FORMAT 'avif' requires Pillow built with AVIF support (Pillow 11.3 or later).")
+                exit(1)
+
+        if self.app_config['LOG_LEVEL'] not in ('DEBUG', 'INFO', 'WARNING', 'ERROR'):
+            print(f"Error: LOG_LEVEL must be 'DEBUG', 'INFO', 'WARNING' or 'ERROR', got '{self.app_config['LOG_LEVEL']}'.")
+            exit(1)
+
+        if self.app_config['SENDFILE_MODE'] not in ('none', 'x-sendfile', 'x-accel-redirect'):
+            print(f"Error: SENDFILE_MODE must be 'none', 'x-sendfile' or 'x-accel-redirect', got '{self.app_config['SENDFILE_MODE']}'.")
+            exit(1)
+
         print(f"Configuration loaded: {self.app_config}")
     
     def get(self, key: str, default: Any = None) -> Any:
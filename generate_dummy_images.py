@@ -37,7 +37,7 @@ def generate_dummy_images(base_photos_dir="photos"):
     base_path = Path(base_photos_dir)
     base_path.mkdir(parents=True, exist_ok=True) # Ensure the base photos directory exists
 
-    for album_name in album_names:
+    for album_index, album_name in enumerate(album_names):
         # Create the full path for the album, including nested directories
         album_path = base_path / album_name
         album_path.mkdir(parents=True, exist_ok=True) # parents=True creates intermediate directories
@@ -46,10 +46,10 @@ def generate_dummy_images(base_photos_dir="photos"):
         # Generate a few photos for each album
         for i in range(3): # Generate 3 photos per album
             # Cycle through colors and text colors
-            bg_color = image_colors[(i + album_names.index(album_name)) % len(image_colors)]
-            txt_color = text_colors[(i + album_names.index(album_name)) % len(text_colors)]
+            bg_color = image_colors[(i + album_index) % len(image_colors)]
+            txt_color = text_colors[(i + album_index) % len(text_colors)]
             size = image_sizes[i % len(image_sizes)]
-            img_type = "jpg" if (i + album_names.index(album_name)) % 2 == 0 else "png" # Alternate types
+            img_type = "jpg" if (i + album_index) % 2 == 0 else "png" # Alternate types
 
             img_filename = f"photo_{i + 1}.{img_type}"
             img_path = album_path / img_filename
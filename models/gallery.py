@@ -2,16 +2,104 @@
 """Gallery model with core business logic for pygallery."""
 
 import os
+import re
+import stat
+import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any
-from flask import url_for
-import traceback
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from urllib.parse import quote
+from flask import url_for, request
+from werkzeug.http import generate_etag
 import logging
 
 from config.settings import config
-from utils.image_processing import is_image_file, is_video_file, get_or_create_thumbnail, get_or_create_video_thumbnail
+from utils.filesystem import walk_photos
+from utils.image_processing import (
+    THUMBNAIL_FORMATS, is_image_file, is_video_file, is_media_file, get_media_type, get_thumbnail_name,
+    get_or_create_thumbnail, get_or_create_video_thumbnail, load_album_sprite, SPRITE_NAME
+)
+from utils.scan_cache import scan_cache, RACY_WINDOW_NS
+from utils.serialization import to_json
 from utils.security import validate_album_name, safe_path_join, SecurityError, sanitize_error_message
 
+# Maximum number of memoized API bodies. Cache keys include the request's
+# URL root, which comes from the Host header, so the caches must be bounded.
+ALBUMS_JSON_CACHE_SIZE = 8
+PHOTOS_JSON_CACHE_SIZE = 256
+
+# The album list is revalidated against the photo tree at most once per this
+# many seconds per process. Revalidating walks the whole tree, which on a
+# large or network-mounted gallery is far too slow to do on every request.
+ALBUMS_REVALIDATE_INTERVAL = 2
+
+# Characters that urllib.parse.quote leaves untouched with its default safe='/'
+_is_url_safe_path = re.compile(r'[A-Za-z0-9_.~/-]*').fullmatch
+
+
+def quote_path(path: str) -> str:
+    """
+    Percent-encodes a relative media path for use in a URL.
+
+    Most gallery filenames are plain ASCII and need no escaping, so they are
+    returned as-is after a single regex match instead of going through
+    urllib.parse.quote character by character.
+
+    Args:
+        path: '/'-separated path relative to PHOTOS_DIR or THUMBNAILS_DIR
+
+    Returns:
+        The path, quoted exactly as urllib.parse.quote would
+    """
+    if _is_url_safe_path(path):
+        return path
+    return quote(path)
+
+
+def _media_unchanged(media_mtimes: Iterable[Tuple[str, int]]) -> bool:
+    """
+    Checks that media files still have the mtimes they were listed with.
+
+    Args:
+        media_mtimes: (path, mtime_ns) pairs recorded by get_photos_for_path()
+
+    Returns:
+        True if every file still exists with the same mtime
+    """
+    for path, mtime_ns in media_mtimes:
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class _BoundedCache:
+    """Thread-safe mapping that evicts its least recently used entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Returns the value stored for key, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Stores a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 
 class Gallery:
     """Core gallery model handling albums and photos."""
@@ -20,14 +108,76 @@ class Gallery:
         self.photos_root = config.get('PHOTOS_DIR')
         self.thumbnails_root = config.get('THUMBNAILS_DIR')
         self.thumbnail_size = config.get('THUMBNAIL_SIZE')
+        # Caps the thumbnails generated at once on request; a page view asks
+        # for all of its thumbnails together, and each one reads an original
+        self._generation_slots = threading.BoundedSemaphore(config.get('THUMBNAIL_CONCURRENCY', 2))
+        # Serialized API responses. URLs are absolute, so both are keyed by the
+        # request's URL root as well.
+        # (url_root, gallery_mode) -> (scan cache generation, JSON body, ETag)
+        self._albums_json_cache = _BoundedCache(ALBUMS_JSON_CACHE_SIZE)
+        # (url_root, album_name) -> (album directory mtime_ns, JSON body, ETag); with
+        # ALBUM_SPRITES, the mtime of the sprite metadata is part of the validator
+        self._photos_json_cache = _BoundedCache(PHOTOS_JSON_CACHE_SIZE)
+        # Serializes the tree walks revalidating the album list, and records
+        # when the last one ran
+        self._albums_revalidate_lock = threading.Lock()
+        self._albums_revalidated_at = None
     
-    def get_photos_for_path(self, fs_path: Path, album_name_for_url: str) -> List[Dict[str, Any]]:
+    def _url_prefixes(self) -> Tuple[str, str]:
+        """
+        Returns the external URL prefixes of the photo and thumbnail routes.
+
+        url_for() is resolved once per response with a placeholder filename,
+        and media URLs are then built by appending the quoted relative path,
+        instead of matching the URL map again for every file.
+
+        Returns:
+            Tuple of (photo_url_prefix, thumbnail_url_prefix)
+        """
+        photo_prefix = url_for('gallery.serve_photo', filename='_', _external=True)[:-1]
+        thumbnail_prefix = url_for('gallery.serve_thumbnail', filename='_', _external=True)[:-1]
+        return photo_prefix, thumbnail_prefix
+
+    def _album_sprite(self, album_key: str, thumbnail_prefix: str) -> Optional[Tuple[Dict[str, list], List[str]]]:
+        """
+        Returns the sprite sheet tiles of an album, if ALBUM_SPRITES built any.
+
+        Args:
+            album_key: Album path relative to PHOTOS_DIR, '.' for the root
+            thumbnail_prefix: URL prefix of the thumbnail route
+
+        Returns:
+            Tuple of (tiles by thumbnail name, sheet URLs), or None
+        """
+        album_thumbnail_dir = str(self.thumbnails_root) if album_key == '.' else f"{self.thumbnails_root}/{album_key}"
+        sprite = load_album_sprite(album_thumbnail_dir)
+        if not sprite:
+            return None
+
+        # The version changes on every rebuild, so cached sheets are never
+        # used with the tile positions of another build
+        album_prefix = '' if album_key == '.' else f"{album_key}/"
+        sheet_urls = [f"{thumbnail_prefix}{quote_path(album_prefix + sheet)}?v={sprite['version']}" for sheet in sprite['sheets']]
+        return sprite['tiles'], sheet_urls
+
+    def _album_sprite_mtime(self, album_name: str) -> Optional[int]:
+        """Returns the mtime of an album's sprite metadata, or None if it has none."""
+        album_thumbnail_dir = self.thumbnails_root if album_name == '__root__' else self.thumbnails_root / album_name
+        try:
+            return (album_thumbnail_dir / f"{SPRITE_NAME}.json").stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def get_photos_for_path(self, fs_path: Path, album_name_for_url: str,
+                            media_mtimes: Optional[List[Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
         """
         Helper to list photos and videos for a given filesystem path and construct their URLs.
 
         Args:
             fs_path: Filesystem path to scan for media files
             album_name_for_url: Name used in Flask URL routing (e.g., '__root__' or 'folder/sub')
+            media_mtimes: Optional list to which the (path, mtime_ns) of every
+                listed media file is appended
 
         Returns:
             List of media dictionaries with URLs and metadata
@@ -39,56 +189,71 @@ class Gallery:
             return []
 
         try:
-            for filename in os.listdir(fs_path):
-                file_path = fs_path / filename
-                if not file_path.is_file():
+            photo_prefix, thumbnail_prefix = self._url_prefixes()
+            _quote_path = quote_path
+
+            # Relative paths are built by prefixing the album path once
+            # computed, rather than with a relative_to() per file
+            album_key = fs_path.relative_to(self.photos_root).as_posix()
+            album_prefix = '' if album_key == '.' else f"{album_key}/"
+
+            sprite_tiles = {}
+            if config.get('ALBUM_SPRITES'):
+                sprite = self._album_sprite(album_key, thumbnail_prefix)
+                if sprite:
+                    sprite_tiles, sheet_urls = sprite
+
+            # Sorting the names up front builds media_list already in order
+            for filename in sorted(os.listdir(fs_path), key=str.lower):
+                # Checking the name first only stats media files
+                media_type = get_media_type(filename)
+                if not media_type:
+                    continue
+                try:
+                    file_stat = os.stat(os.path.join(fs_path, filename))
+                except OSError:
+                    continue
+                if not stat.S_ISREG(file_stat.st_mode):
                     continue
+                if media_mtimes is not None:
+                    media_mtimes.append((os.path.join(fs_path, filename), file_stat.st_mtime_ns))
+
+                filename_for_url_arg = album_prefix + filename
+
+                # Thumbnails are generated on first request by serve_thumbnail.
+                # Versioning the URL with the source's mtime lets browsers cache
+                # it for good, and a replaced photo gets a new URL
+                thumb_url = f"{thumbnail_prefix}{_quote_path(get_thumbnail_name(filename_for_url_arg))}?v={file_stat.st_mtime_ns}"
+                original_url = photo_prefix + _quote_path(filename_for_url_arg)
+
+                media = {
+                    "original_filename": filename,
+                    "original_url": original_url,
+                    "thumbnail_url": thumb_url,
+                    "media_type": media_type
+                }
+
+                tile = sprite_tiles.get(get_thumbnail_name(filename)) if sprite_tiles else None
+                if tile:
+                    sheet, x, y, width, height = tile
+                    media["sprite"] = {"url": sheet_urls[sheet], "x": x, "y": y, "width": width, "height": height}
+
+                media_list.append(media)
 
-                media_type = None
-                relative_to_photos_root = file_path.relative_to(self.photos_root)
-                filename_for_url_arg = str(relative_to_photos_root).replace(os.sep, '/')
-
-                if is_image_file(filename):
-                    # Process image
-                    media_type = 'image'
-                    thumbnail_path = self.thumbnails_root / relative_to_photos_root
-                    get_or_create_thumbnail(file_path, thumbnail_path, self.thumbnail_size)
-                    thumb_url = url_for('gallery.serve_thumbnail', filename=filename_for_url_arg, _external=True)
-
-                elif is_video_file(filename):
-                    # Process video
-                    media_type = 'video'
-                    # Video thumbnails are saved as .jpg
-                    relative_thumbnail_path = relative_to_photos_root.parent / f"{Path(filename).stem}.jpg"
-                    thumbnail_path = self.thumbnails_root / relative_thumbnail_path
-                    get_or_create_video_thumbnail(file_path, thumbnail_path, self.thumbnail_size)
-
-                    # Thumbnail URL uses .jpg extension
-                    thumb_filename_for_url = str(relative_thumbnail_path).replace(os.sep, '/')
-                    thumb_url = url_for('gallery.serve_thumbnail', filename=thumb_filename_for_url, _external=True)
-
-                if media_type:
-                    original_url = url_for('gallery.serve_photo', filename=filename_for_url_arg, _external=True)
-
-                    media_list.append({
-                        "original_filename": filename,
-                        "original_url": original_url,
-                        "thumbnail_url": thumb_url,
-                        "media_type": media_type
-                    })
-
-            media_list.sort(key=lambda x: x['original_filename'].lower())
             logging.debug(f"get_photos_for_path: Found {len(media_list)} media files in {sanitize_error_message(str(fs_path))}")
             return media_list
         except Exception as e:
-            logging.error(f"Error in get_photos_for_path for {sanitize_error_message(str(fs_path))}: {e}")
-            traceback.print_exc()
+            logging.exception(f"Error in get_photos_for_path for {sanitize_error_message(str(fs_path))}: {e}")
             return []
     
-    def get_albums_data(self) -> Dict[str, Any]:
+    def get_albums_data(self, media_dirs: Optional[List[Tuple[str, List[str]]]] = None) -> Dict[str, Any]:
         """
         Returns a dictionary indicating gallery mode (flat or nested) and album/photo data.
-        
+
+        Args:
+            media_dirs: Result of scan_media_dirs(), to reuse a walk the
+                caller already made; the tree is walked if omitted
+
         Returns:
             Dictionary with mode and albums/photos data
         """
@@ -104,23 +269,15 @@ class Gallery:
             logging.error(f"PHOTOS_DIR '{self.photos_root}' does not exist or is not a directory. Returning empty response.")
             return {"mode": "nested_gallery", "albums": []}
 
-        # Determine if it's a flat gallery (only root photos, no sub-albums with photos)
-        is_flat_gallery = False
-        root_photos_count = 0
-        nested_albums_count = 0
+        if media_dirs is None:
+            media_dirs = self.scan_media_dirs()
 
-        # Walk through the directories to count media files and albums
-        for dirpath, dirnames, filenames in os.walk(self.photos_root, topdown=True):
-            current_dir_media = [f for f in filenames if is_image_file(f) or is_video_file(f)]
-
-            if Path(dirpath) == self.photos_root:  # Root directory
-                root_photos_count = len(current_dir_media)
-            elif current_dir_media:  # Any subdirectory with media
-                nested_albums_count += 1
+        # Determine if it's a flat gallery (only root photos, no sub-albums with photos)
+        root_photos_count = sum(len(media) for relative_path, media in media_dirs if relative_path == '.')
+        nested_albums_count = sum(1 for relative_path, _ in media_dirs if relative_path != '.')
 
         # Define flat gallery criteria: media in root, and no other media-containing subdirectories
-        if root_photos_count > 0 and nested_albums_count == 0:
-            is_flat_gallery = True
+        is_flat_gallery = root_photos_count > 0 and nested_albums_count == 0
 
         # Conditional Response based on GALLERY_MODE
         if gallery_mode == 'FLAT_ROOT_DISPLAY' and is_flat_gallery:
@@ -129,71 +286,51 @@ class Gallery:
             return {"mode": "flat_gallery", "photos": root_photos_data}
         else:
             logging.info("Detected NESTED_GALLERY mode or FLAT_ROOT_DISPLAY disabled. Serving album list.")
-            # Rebuild albums_list logic for nested/default display
             found_albums_data = {}
+            _, thumbnail_prefix = self._url_prefixes()
             
-            for dirpath, dirnames, filenames in os.walk(self.photos_root):
-                current_dir_media = [f for f in filenames if is_image_file(f) or is_video_file(f)]
-
-                if current_dir_media:
-                    try:
-                        relative_path = Path(dirpath).relative_to(self.photos_root)
-                        album_name_key = str(relative_path).replace(os.sep, '/')
-
-                        # Try to use first image for cover, fall back to video if no images
-                        first_image = next((f for f in filenames if is_image_file(f)), None)
-                        first_video = next((f for f in filenames if is_video_file(f)), None)
-
-                        if first_image:
-                            cover_filename = first_image
-                            cover_path = Path(dirpath) / first_image
-                            thumbnail_filename = first_image
-                        elif first_video:
-                            cover_filename = first_video
-                            cover_path = Path(dirpath) / first_video
-                            # Video thumbnails use .jpg extension
-                            thumbnail_filename = f"{Path(first_video).stem}.jpg"
-                        else:
-                            continue  # No media found
-
-                        album_thumbnail_dir = self.thumbnails_root / relative_path
-                        cover_thumbnail_path = album_thumbnail_dir / thumbnail_filename
-
-                        # Generate thumbnail based on media type
-                        if first_image:
-                            get_or_create_thumbnail(cover_path, cover_thumbnail_path, self.thumbnail_size)
-                        elif first_video:
-                            get_or_create_video_thumbnail(cover_path, cover_thumbnail_path, self.thumbnail_size)
-
-                        # Correct filename construction for url_for to handle root album
-                        serve_filename_for_url = thumbnail_filename if album_name_key == '.' else f"{album_name_key}/{thumbnail_filename}"
-                        cover_thumbnail_url = url_for('gallery.serve_thumbnail', filename=serve_filename_for_url, _external=True)
-
-                        # Map '.' to '__root__' for external facing album name
-                        album_name_for_url = '__root__' if album_name_key == '.' else album_name_key
-
-                        found_albums_data[album_name_key] = {
-                            "name": album_name_for_url,
-                            "display_name": album_name_key if album_name_key != '.' else 'Root Gallery',
-                            "cover_thumbnail_url": cover_thumbnail_url,
-                            "photo_count": len(current_dir_media)
-                        }
-                    except Exception as e:
-                        logging.error(f"Error processing album directory {sanitize_error_message(str(dirpath))}: {e}")
-                        traceback.print_exc()
+            for album_name_key, current_dir_media in media_dirs:
+                try:
+                    # The cover is the album's first image in display order, or its
+                    # first video if it has no images; min() avoids sorting the album
+                    first_image = min((f for f in current_dir_media if is_image_file(f)), key=str.lower, default=None)
+                    cover_filename = first_image or min(current_dir_media, key=str.lower)
+                    thumbnail_filename = get_thumbnail_name(cover_filename)
+
+                    # The cover thumbnail is generated on first request by serve_thumbnail
+                    # Correct filename construction to handle root album
+                    serve_filename_for_url = thumbnail_filename if album_name_key == '.' else f"{album_name_key}/{thumbnail_filename}"
+                    cover_thumbnail_url = thumbnail_prefix + quote_path(serve_filename_for_url)
+
+                    # Map '.' to '__root__' for external facing album name
+                    album_name_for_url = '__root__' if album_name_key == '.' else album_name_key
+
+                    found_albums_data[album_name_key] = {
+                        "name": album_name_for_url,
+                        "display_name": album_name_key if album_name_key != '.' else 'Root Gallery',
+                        "cover_thumbnail_url": cover_thumbnail_url,
+                        "photo_count": len(current_dir_media)
+                    }
+                except Exception as e:
+                    logging.exception(f"Error processing album directory {sanitize_error_message(album_name_key)}: {e}")
             
-            albums_list = list(found_albums_data.values())
-            albums_list.sort(key=lambda x: x['display_name'].lower())
+            # Decorate-sort-undecorate: tuples compare in C, with no per-item lambda call
+            decorated = [(album['display_name'].lower(), index, album) for index, album in enumerate(found_albums_data.values())]
+            decorated.sort()
+            albums_list = [album for _, _, album in decorated]
             
             logging.info(f"API albums response: Found {len(albums_list)} albums in nested mode.")
             return {"mode": "nested_gallery", "albums": albums_list}
     
-    def get_album_photos(self, album_name: str) -> List[Dict[str, Any]]:
+    def get_album_photos(self, album_name: str,
+                         media_mtimes: Optional[List[Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
         """
         Get photos for a specific album.
         
         Args:
             album_name: Album name ('__root__' for root album or path like 'folder/sub')
+            media_mtimes: Optional list to which the (path, mtime_ns) of every
+                listed media file is appended
             
         Returns:
             List of photo dictionaries
@@ -205,11 +342,195 @@ class Gallery:
         sanitized_album_name = validate_album_name(album_name)
         
         if sanitized_album_name == '__root__':
-            return self.get_photos_for_path(self.photos_root, '__root__')
+            return self.get_photos_for_path(self.photos_root, '__root__', media_mtimes)
         else:
             # Use safe path join to prevent directory traversal
             album_path = safe_path_join(self.photos_root, sanitized_album_name)
-            return self.get_photos_for_path(album_path, sanitized_album_name)
+            return self.get_photos_for_path(album_path, sanitized_album_name, media_mtimes)
+
+    def scan_media_dirs(self) -> List[Tuple[str, List[str]]]:
+        """
+        Walks the photo tree, revalidating the directory listing cache.
+
+        A single walk collects the media of every directory; unchanged
+        directories only cost a stat and are listed from the scan cache.
+
+        Returns:
+            List of (directory path relative to PHOTOS_DIR, media filenames)
+            for every directory containing media
+        """
+        media_dirs = []
+        scanned_dirs = []
+        for _, relative_path, _, filenames in walk_photos():
+            scanned_dirs.append(relative_path)
+            current_dir_media = [f for f in filenames if is_media_file(f)]
+            if current_dir_media:
+                media_dirs.append((relative_path, current_dir_media))
+        scan_cache.retain(scanned_dirs)
+        scan_cache.save()
+        return media_dirs
+
+    def get_albums_json(self) -> Tuple[bytes, str]:
+        """
+        Returns get_albums_data() serialized as JSON, with its ETag.
+
+        The response is memoized and only rebuilt when a directory under
+        PHOTOS_DIR changed since it was computed. The tree is revalidated at
+        most once per ALBUMS_REVALIDATE_INTERVAL, so changes can take that
+        long to show up; a rebuild reuses the revalidating walk when there
+        was one.
+
+        Returns:
+            Tuple of (JSON encoded albums data, ETag of that body)
+        """
+        media_dirs = None
+        with self._albums_revalidate_lock:
+            now = time.monotonic()
+            if self._albums_revalidated_at is None or now - self._albums_revalidated_at >= ALBUMS_REVALIDATE_INTERVAL:
+                media_dirs = self.scan_media_dirs()
+                self._albums_revalidated_at = now
+            generation = scan_cache.generation
+        cache_key = (request.url_root, os.environ.get('GALLERY_MODE', 'ALBUM_DISPLAY'))
+
+        cached = self._albums_json_cache.get(cache_key)
+        if cached is not None and cached[0] == generation:
+            return cached[1], cached[2]
+
+        body = to_json(self.get_albums_data(media_dirs))
+        etag = generate_etag(body)
+        self._albums_json_cache.put(cache_key, (generation, body, etag))
+        return body, etag
+
+    def get_album_photos_json(self, album_name: str) -> Tuple[bytes, str]:
+        """
+        Returns get_album_photos() serialized as JSON, with its ETag.
+
+        The response is memoized per album and rebuilt when the album
+        directory's mtime changes, i.e. when media is added, removed or renamed,
+        or when a media file's own mtime changes, since a photo overwritten in
+        place must get a new versioned thumbnail URL.
+
+        Args:
+            album_name: Album name ('__root__' for root album or path like 'folder/sub')
+
+        Returns:
+            Tuple of (JSON encoded list of photo dictionaries, ETag of that body)
+
+        Raises:
+            SecurityError: If album name is invalid
+        """
+        sanitized_album_name = validate_album_name(album_name)
+        if sanitized_album_name == '__root__':
+            album_path = self.photos_root
+        else:
+            album_path = safe_path_join(self.photos_root, sanitized_album_name)
+
+        try:
+            mtime_ns = album_path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        # Sprite sheets are built by the background scan, after the album
+        # may already have been served without them
+        validator = mtime_ns
+        if mtime_ns is not None and config.get('ALBUM_SPRITES'):
+            validator = (mtime_ns, self._album_sprite_mtime(sanitized_album_name))
+
+        cache_key = (request.url_root, sanitized_album_name)
+        cached = self._photos_json_cache.get(cache_key)
+        if (cached is not None and mtime_ns is not None and cached[0] == validator
+                and _media_unchanged(cached[3])):
+            return cached[1], cached[2]
+
+        # The mtimes come from the stat that versioned each thumbnail URL, so
+        # the memo can never vouch for a body built from older files
+        media_mtimes = []
+        body = to_json(self.get_album_photos(sanitized_album_name, media_mtimes))
+        etag = generate_etag(body)
+        # Skip memoizing directories or files modified within the current mtime tick
+        if mtime_ns is not None:
+            newest_ns = max([mtime_ns] + [file_mtime_ns for _, file_mtime_ns in media_mtimes])
+            if time.time_ns() - newest_ns >= RACY_WINDOW_NS:
+                self._photos_json_cache.put(cache_key, (validator, body, etag, tuple(media_mtimes)))
+        return body, etag
+
+    def ensure_thumbnail(self, thumbnail_filename: str, check_outdated: bool = False) -> bool:
+        """
+        Generates a missing or outdated thumbnail from its original media file.
+
+        The original is found by reversing get_thumbnail_name(): stripping
+        the thumbnail format's extension, or with THUMBNAIL_FORMAT 'original',
+        using the same name for images and the video with the same stem.
+
+        Args:
+            thumbnail_filename: Thumbnail path relative to THUMBNAILS_DIR (e.g., 'folder/sub/photo.jpg.webp')
+            check_outdated: Whether to also regenerate an existing thumbnail
+                that is older than its original on disk
+
+        Returns:
+            True if the thumbnail exists or was generated, False otherwise
+
+        Raises:
+            SecurityError: If the filename is invalid
+        """
+        thumbnail_path = safe_path_join(self.thumbnails_root, thumbnail_filename)
+        try:
+            thumbnail_mtime_ns = thumbnail_path.stat().st_mtime_ns
+        except OSError:
+            thumbnail_mtime_ns = None  # Missing
+        else:
+            if not check_outdated:
+                return True
+
+        original_path = None
+        thumbnail_format = config.get('THUMBNAIL_FORMAT')
+        if thumbnail_format in THUMBNAIL_FORMATS:
+            extension = THUMBNAIL_FORMATS[thumbnail_format][0]
+            if thumbnail_filename.endswith(extension):
+                original_path = safe_path_join(self.photos_root, thumbnail_filename[:-len(extension)])
+        else:
+            original_path = safe_path_join(self.photos_root, thumbnail_filename)
+            if not (original_path.is_file() and is_image_file(original_path.name)):
+                # Look for a video whose thumbnail this is
+                original_path = None
+                album_path = safe_path_join(self.photos_root, thumbnail_filename).parent
+                if album_path.is_dir():
+                    with os.scandir(album_path) as it:
+                        for entry in it:
+                            if is_video_file(entry.name) and Path(entry.name).stem == thumbnail_path.stem:
+                                original_path = Path(entry.path)
+                                break
+
+        if original_path is None:
+            return False
+        try:
+            original_stat = original_path.stat()
+        except OSError:
+            return False
+        if not stat.S_ISREG(original_stat.st_mode):
+            return False
+
+        # Staleness is judged against the original on disk: the version in
+        # a thumbnail URL comes from the client and is not trusted for it
+        if thumbnail_mtime_ns is not None and thumbnail_mtime_ns >= original_stat.st_mtime_ns:
+            return True
+        outdated = thumbnail_mtime_ns is not None
+
+        # Guard against a thumbnail name that doesn't map back to itself
+        if get_thumbnail_name(original_path.name) != thumbnail_path.name:
+            return False
+
+        media_type = get_media_type(original_path.name)
+        if media_type is None:
+            return False
+
+        thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._generation_slots:
+            # Without overwrite, a thumbnail made by another request while
+            # this one waited is used as is
+            if media_type == 'image':
+                return get_or_create_thumbnail(original_path, thumbnail_path, self.thumbnail_size, overwrite=outdated)
+            return get_or_create_video_thumbnail(original_path, thumbnail_path, self.thumbnail_size, overwrite=outdated)
 
 
 # Global gallery instance
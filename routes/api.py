@@ -10,6 +10,25 @@ from utils.security import validate_album_name, SecurityError, sanitize_error_me
 from utils.rate_limiter import rate_limit
 
 
+def json_response(body: bytes, etag: str) -> Response:
+    """
+    Wraps an encoded JSON body in a response that supports revalidation.
+
+    Clients sending the body's ETag back in If-None-Match get an empty
+    304 Not Modified instead of the whole listing again.
+
+    Args:
+        body: JSON encoded response body
+        etag: ETag of body, computed when the body was memoized
+
+    Returns:
+        JSON response, or 304 if the client's copy is current
+    """
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
 def register_api_routes(blueprint: 'Blueprint') -> None:
     """Register API routes with the given blueprint."""
     
@@ -20,9 +39,8 @@ def register_api_routes(blueprint: 'Blueprint') -> None:
         Returns a JSON response indicating gallery mode (flat or nested) and album/photo data.
         """
         try:
-            logging.info(f"API albums request from {request.remote_addr}")
-            albums_data = gallery.get_albums_data()
-            return jsonify(albums_data)
+            logging.debug(f"API albums request from {request.remote_addr}")
+            return json_response(*gallery.get_albums_json())
         except Exception as e:
             logging.error(f"Error in api_albums: {e}")
             return jsonify({
@@ -40,10 +58,10 @@ def register_api_routes(blueprint: 'Blueprint') -> None:
         try:
             # Validate and sanitize album name
             sanitized_album_name = validate_album_name(album_name)
-            logging.info(f"API photos requested for album: {sanitize_error_message(sanitized_album_name)}")
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"API photos requested for album: {sanitize_error_message(sanitized_album_name)}")
             
-            photos = gallery.get_album_photos(sanitized_album_name)
-            return jsonify(photos)
+            return json_response(*gallery.get_album_photos_json(sanitized_album_name))
         except SecurityError as e:
             logging.warning(f"Security error in api_album_photos_nested: {e}")
             return jsonify({
@@ -66,9 +84,8 @@ def register_api_routes(blueprint: 'Blueprint') -> None:
         This endpoint handles requests without the '/photos' suffix for the root.
         """
         try:
-            logging.info("API photos requested for root album")
-            photos = gallery.get_album_photos('__root__')
-            return jsonify(photos)
+            logging.debug("API photos requested for root album")
+            return json_response(*gallery.get_album_photos_json('__root__'))
         except Exception as e:
             logging.error(f"Error in api_album_photos_root: {e}")
             return jsonify({
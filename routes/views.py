@@ -1,12 +1,17 @@
 # routes/views.py
 """View routes for rendering templates in pygallery."""
 
-from flask import Blueprint, render_template, send_from_directory, abort, Response
+from flask import Blueprint, render_template, send_from_directory, abort, make_response, request, url_for, Response
 from pathlib import Path
 from typing import Union
+from urllib.parse import quote
+import mimetypes
 import logging
+from werkzeug.exceptions import NotFound
 
 from config.settings import config
+from models.gallery import gallery
+from utils.image_processing import is_thumbnail_file, is_sprite_sheet
 from utils.security import validate_album_name, validate_filename, safe_path_join, SecurityError, sanitize_error_message
 
 
@@ -17,15 +22,71 @@ gallery_bp = Blueprint('gallery', __name__,
                        static_url_path='/static')
 
 
+# Cache lifetime of versioned thumbnail URLs (one year, the usual maximum)
+IMMUTABLE_MAX_AGE = 31536000
+
+
 # Register API routes on this blueprint
 from routes.api import register_api_routes
 register_api_routes(gallery_bp)
 
 
+def send_media_file(full_path: Path, root_dir: Path, location: str, immutable: bool = False) -> Response:
+    """
+    Sends a file from PHOTOS_DIR or THUMBNAILS_DIR.
+
+    With SENDFILE_MODE set to 'x-accel-redirect', no bytes go through Flask:
+    the response only tells nginx which internal location to serve. With
+    'x-sendfile', Flask's USE_X_SENDFILE does the same for Apache/lighttpd.
+
+    Args:
+        full_path: Validated absolute path of the file to send
+        root_dir: PHOTOS_DIR or THUMBNAILS_DIR
+        location: URL segment of the root directory ('photos' or 'thumbnails')
+        immutable: Whether the URL is versioned, so that the content behind
+            it never changes and browsers may keep it without revalidating
+
+    Returns:
+        Response serving the file
+
+    Raises:
+        NotFound: If the file does not exist
+    """
+    max_age = IMMUTABLE_MAX_AGE if immutable else config.get('CACHE_MAX_AGE')
+
+    if config.get('SENDFILE_MODE') == 'x-accel-redirect':
+        # Nothing else stats the file in this mode
+        if not full_path.is_file():
+            raise NotFound()
+        relative_path = full_path.relative_to(root_dir).as_posix()
+        response = Response(mimetype=mimetypes.guess_type(full_path.name)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{config.get('ACCEL_REDIRECT_PREFIX')}/{location}/{quote(relative_path)}"
+        if max_age > 0:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = immutable
+        return response
+
+    # send_from_directory automatically sets correct MIME type based on file extension,
+    # answers If-None-Match/If-Modified-Since with 304 using its ETag and Last-Modified,
+    # and raises NotFound for missing files, so no separate existence check is needed
+    response = send_from_directory(full_path.parent, full_path.name, max_age=max_age)
+    response.cache_control.immutable = immutable
+    return response
+
+
 @gallery_bp.route('/')
-def index() -> str:
-    """Serves the main gallery page."""
-    return render_template('index.html')
+def index() -> Response:
+    """
+    Serves the main gallery page.
+
+    The page preloads the albums API so the browser fetches it while the
+    HTML is still being parsed, and a Link header starts the download of
+    the script before the body is even read.
+    """
+    response = make_response(render_template('index.html', albums_api_url=url_for('gallery.api_albums')))
+    response.headers.add('Link', f"<{url_for('gallery.static', filename='js/script.js')}>; rel=preload; as=script")
+    return response
 
 
 @gallery_bp.route('/album/<path:album_name>')
@@ -56,16 +117,15 @@ def serve_photo(filename: str) -> Response:
         # Use safe path join to prevent directory traversal
         full_photo_path = safe_path_join(photos_dir, filename)
 
-        if not full_photo_path.is_file():
-            logging.warning(f"Media file not found: {sanitize_error_message(str(full_photo_path))}")
-            abort(404, description="Media file not found")
-
-        directory_to_serve_from = full_photo_path.parent
-        file_base_name = full_photo_path.name
-        logging.info(f"Serving media file: {sanitize_error_message(str(full_photo_path))}")
-        # send_from_directory automatically sets correct MIME type based on file extension
-        return send_from_directory(directory_to_serve_from, file_base_name)
+        # Logged at debug level: a page view requests every thumbnail, so
+        # this runs far too often to format and write by default
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Serving media file: {sanitize_error_message(str(full_photo_path))}")
+        return send_media_file(full_photo_path, photos_dir, 'photos')
         
+    except NotFound:
+        logging.warning(f"Media file not found: {sanitize_error_message(filename)}")
+        abort(404, description="Media file not found")
     except SecurityError as e:
         logging.warning(f"Security error in serve_photo: {e}")
         abort(400, description="Invalid filename")
@@ -77,6 +137,11 @@ def serve_photo(filename: str) -> Response:
 @gallery_bp.route('/thumbnails/<path:filename>')
 def serve_thumbnail(filename: str) -> Response:
     """Serves generated thumbnail files. Filename now includes album subpaths."""
+    # Thumbnails are always images; this keeps other files in THUMBNAILS_DIR
+    # (such as the scan cache) from being served.
+    if not is_thumbnail_file(filename):
+        abort(404, description="Thumbnail not found")
+
     try:
         # Validate filename components
         thumbnails_dir = config.get('THUMBNAILS_DIR')
@@ -84,15 +149,32 @@ def serve_thumbnail(filename: str) -> Response:
         # Use safe path join to prevent directory traversal
         full_thumbnail_path = safe_path_join(thumbnails_dir, filename)
         
-        if not full_thumbnail_path.is_file():
-            logging.warning(f"Thumbnail not found: {sanitize_error_message(str(full_thumbnail_path))}")
-            abort(404, description="Thumbnail not found")
-
-        directory_to_serve_from = full_thumbnail_path.parent
-        file_base_name = full_thumbnail_path.name
-        logging.info(f"Serving thumbnail: {sanitize_error_message(str(full_thumbnail_path))}")
-        return send_from_directory(directory_to_serve_from, file_base_name)
+        # Media thumbnail URLs carry the source's mtime as 'v', sprite sheet
+        # URLs their build version; either way the URL changes with the content
+        versioned = request.args.get('v', type=int) is not None
+        # Whether this request already tried to (re)generate the thumbnail
+        ensured = False
+        if versioned and not is_sprite_sheet(filename):
+            # The URL will be cached for good, so it must not get a thumbnail
+            # made from an older version of the source. This also generates a
+            # missing one, so there is no point in trying again below
+            if not gallery.ensure_thumbnail(filename, check_outdated=True):
+                raise NotFound()
+            ensured = True
+
+        try:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Serving thumbnail: {sanitize_error_message(str(full_thumbnail_path))}")
+            return send_media_file(full_thumbnail_path, thumbnails_dir, 'thumbnails', immutable=versioned)
+        except NotFound:
+            # Thumbnails are generated lazily, on the first request for them
+            if ensured or not gallery.ensure_thumbnail(filename):
+                raise
+            return send_media_file(full_thumbnail_path, thumbnails_dir, 'thumbnails', immutable=versioned)
         
+    except NotFound:
+        logging.warning(f"Thumbnail not found: {sanitize_error_message(filename)}")
+        abort(404, description="Thumbnail not found")
     except SecurityError as e:
         logging.warning(f"Security error in serve_thumbnail: {e}")
         abort(400, description="Invalid filename")
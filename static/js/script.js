@@ -944,12 +944,26 @@ function createPhotoElement(photo, index, photosArray) {
     photoThumbnail.setAttribute('aria-label', `View ${isVideo ? 'video' : 'photo'} ${photo.original_filename}`);
     photoThumbnail.setAttribute('tabindex', '0');
 
-    const img = document.createElement('img');
-    img.src = photo.thumbnail_url;
-    img.alt = `${isVideo ? 'Video' : 'Photo'}: ${photo.original_filename}`;
-    img.loading = 'lazy';
-
-    photoThumbnail.appendChild(img);
+    const altText = `${isVideo ? 'Video' : 'Photo'}: ${photo.original_filename}`;
+
+    if (photo.sprite) {
+        // Tile of the album's sprite sheet: the whole album shares one download
+        const tile = document.createElement('div');
+        tile.className = 'sprite-tile';
+        tile.setAttribute('role', 'img');
+        tile.setAttribute('aria-label', altText);
+        tile.style.width = `${photo.sprite.width}px`;
+        tile.style.height = `${photo.sprite.height}px`;
+        tile.style.backgroundImage = `url("${photo.sprite.url}")`;
+        tile.style.backgroundPosition = `-${photo.sprite.x}px -${photo.sprite.y}px`;
+        photoThumbnail.appendChild(tile);
+    } else {
+        const img = document.createElement('img');
+        img.src = photo.thumbnail_url;
+        img.alt = altText;
+        img.loading = 'lazy';
+        photoThumbnail.appendChild(img);
+    }
 
     // Add video play icon overlay for videos
     if (isVideo) {
@@ -0,0 +1,138 @@
+"""Filesystem traversal utilities for pygallery."""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Collection, Iterator, List, Optional, Tuple
+
+from config.settings import config
+from utils.scan_cache import ScanCache, scan_cache
+
+
+def _scan_directory(dirpath: str) -> Tuple[List[str], List[str]]:
+    """Reads a directory and splits its entries into (dirnames, filenames)."""
+    dirnames = []
+    filenames = []
+
+    with os.scandir(dirpath) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirnames.append(entry.name)
+                elif entry.is_file():
+                    filenames.append(entry.name)
+            except OSError:
+                continue  # Entry vanished or is unreadable
+
+    return dirnames, filenames
+
+
+def _read_directory(dirpath: str, relative_path: str, cache: Optional[ScanCache]) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Lists a directory, going through the cache when one is given.
+
+    Returns:
+        Tuple of (dirnames, filenames), or None if the directory can't be read
+    """
+    try:
+        if cache is None:
+            return _scan_directory(dirpath)
+
+        mtime_ns = os.stat(dirpath).st_mtime_ns
+        cached = cache.lookup(relative_path, mtime_ns)
+        if cached is not None:
+            return cached
+
+        dirnames, filenames = _scan_directory(dirpath)
+        cache.store(relative_path, mtime_ns, dirnames, filenames)
+        return dirnames, filenames
+    except OSError as e:
+        logging.warning(f"Unable to scan directory {dirpath}: {e}")
+        return None
+
+
+def walk_tree(root: str, cache: Optional[ScanCache] = None, max_workers: int = 1,
+              exclude_names: Collection[str] = (), exclude_paths: Collection[str] = ()) -> Iterator[Tuple[str, str, List[str], List[str]]]:
+    """
+    Walks a directory tree top-down using os.scandir.
+
+    Unlike os.walk, entries are classified from the d_type returned by
+    readdir, so files and directories are told apart without an extra stat
+    per entry. The relative path of each directory is tracked incrementally
+    instead of being recomputed with Path.relative_to.
+
+    The tree is walked breadth-first. With max_workers > 1, the directories
+    of each level are read concurrently by a thread pool, which hides the
+    per-directory syscall latency of slow or network filesystems.
+
+    When a cache is given, each directory is stat'ed first and its listing
+    is taken from the cache if the directory's mtime has not changed.
+
+    Hidden directories (starting with '.') are never descended into, nor
+    are directories named in exclude_names or located at exclude_paths.
+    They are pruned before being read, so their contents cost no syscalls.
+
+    Args:
+        root: Directory to walk
+        cache: Optional ScanCache used to skip reading unchanged directories
+        max_workers: Number of threads used to read directories
+        exclude_names: Names of directories to skip wherever they appear
+        exclude_paths: Paths of directories to skip, in the same form as
+            root (e.g. THUMBNAILS_DIR when it lives inside PHOTOS_DIR)
+
+    Yields:
+        Tuples of (dirpath, relative_path, dirnames, filenames) where
+        relative_path uses '/' separators and is '.' for the root itself,
+        and filenames only lists regular files (or symlinks to them).
+        dirnames only lists the directories that will be walked.
+    """
+    level = [(str(root), '.')]
+    executor = None
+
+    try:
+        while level:
+            if max_workers > 1 and len(level) > 1:
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=max_workers)
+                listings = executor.map(lambda directory: _read_directory(directory[0], directory[1], cache), level)
+            else:
+                listings = (_read_directory(dirpath, relative_path, cache) for dirpath, relative_path in level)
+
+            next_level = []
+            for (dirpath, relative_path), listing in zip(level, listings):
+                if listing is None:
+                    continue
+
+                dirnames = []
+                for name in listing[0]:
+                    if name.startswith('.') or name in exclude_names:
+                        continue
+                    child_path = os.path.join(dirpath, name)
+                    if child_path in exclude_paths:
+                        continue
+                    dirnames.append(name)
+                    next_level.append((child_path, name if relative_path == '.' else f"{relative_path}/{name}"))
+
+                # dirnames is a new list, so callers can't alter a cached listing
+                yield dirpath, relative_path, dirnames, listing[1]
+
+            level = next_level
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def walk_photos() -> Iterator[Tuple[str, str, List[str], List[str]]]:
+    """
+    Walks PHOTOS_DIR with the persistent scan cache.
+
+    Skips the directories listed in EXCLUDE_DIRS, and THUMBNAILS_DIR when it
+    is located inside PHOTOS_DIR. See walk_tree for what is yielded.
+    """
+    return walk_tree(
+        config.get('PHOTOS_DIR'),
+        cache=scan_cache,
+        max_workers=config.get('SCAN_THREADS', 1),
+        exclude_names=config.get('EXCLUDE_DIRS', frozenset()),
+        exclude_paths=(str(config.get('THUMBNAILS_DIR')),),
+    )
@@ -2,14 +2,34 @@
 """Image processing utilities for pygallery."""
 
 import os
+import json
+import time
 import logging
+import multiprocessing
 import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
-from typing import Tuple
-from PIL import Image, ImageFile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from PIL import Image, ImageFile, ImageOps
 
 from config.settings import config
-from utils.security import validate_file_extension
+from utils.filesystem import walk_photos
+from utils.scan_cache import scan_cache
+
+# Used to let a single process run the startup scan; not available on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# libvips is optional: it streams the decode and shrinks JPEGs on load,
+# which is much faster than PIL for large originals.
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
 
 # Enable loading truncated images (PIL will load as much as possible)
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -21,46 +41,217 @@ IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp')
 VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.webm', '.mkv', '.m4v', '.3gp')
 
 
+# Hash lookups for the extension checks, which run for every file in the tree
+_IMAGE_EXTENSION_SET = frozenset(IMAGE_EXTENSIONS)
+_VIDEO_EXTENSION_SET = frozenset(VIDEO_EXTENSIONS)
+_MEDIA_TYPES = {**{ext: 'video' for ext in VIDEO_EXTENSIONS}, **{ext: 'image' for ext in IMAGE_EXTENSIONS}}
+
+
+# Thumbnail formats: file extension appended to the media filename, and
+# encoder options for PIL and libvips. 'original' keeps the source format.
+# PIL drops EXIF unless asked to keep it; libvips needs strip to match.
+THUMBNAIL_FORMATS = {
+    'webp': ('.webp', {'quality': 80, 'method': 4}, {'Q': 80, 'strip': True}),
+    'jpeg': ('.jpg', {'quality': 85}, {'Q': 85, 'strip': True}),
+    'avif': ('.avif', {'quality': 60}, {'Q': 60, 'strip': True}),
+}
+
+# Extensions of the files served from THUMBNAILS_DIR: thumbnails keep the
+# source's extension with THUMBNAIL_FORMAT 'original'
+_THUMBNAIL_EXTENSION_SET = _IMAGE_EXTENSION_SET | {extension for extension, _, _ in THUMBNAIL_FORMATS.values()}
+
+
+def get_thumbnail_name(filename: str) -> str:
+    """
+    Returns the thumbnail filename for a media filename.
+
+    With THUMBNAIL_FORMAT 'original', image thumbnails keep the name of the
+    image and video thumbnails are named after the video's stem with a .jpg
+    extension. Otherwise the format's extension is appended to the full
+    filename (e.g. 'photo.png.webp'), which keeps names unique per source.
+
+    Args:
+        filename: Media filename, optionally prefixed with its album path
+
+    Returns:
+        Thumbnail filename, with the same album path prefix
+    """
+    thumbnail_format = config.get('THUMBNAIL_FORMAT')
+    if thumbnail_format in THUMBNAIL_FORMATS:
+        return filename + THUMBNAIL_FORMATS[thumbnail_format][0]
+    if is_video_file(filename):
+        return filename[:filename.rfind('.')] + '.jpg'
+    return filename
+
+
+# Sprite sheets combine the thumbnails of an album so that the album page can
+# show all of them with a few requests. Sheets are kept within
+# MAX_SPRITE_SIZE pixels on each side, which bounds the memory used to
+# compose them and stays well below the 16383px limit of WebP.
+SPRITE_NAME = '__sprite__'
+MAX_SPRITE_SIZE = 4096
+
+# The startup scan logs its progress every this many thumbnails
+PROGRESS_INTERVAL = 500
+
+# The startup scan sends thumbnails to its workers in batches of this size,
+# and keeps at most this many batches per worker submitted but unfinished
+TASK_BATCH_SIZE = 16
+MAX_PENDING_BATCHES_PER_WORKER = 4
+
+# Worker processes are started from a fresh server process rather than
+# forked from the gunicorn worker: forking a multi-threaded process can copy
+# a lock held by another thread (logging, PIL, the scan cache) and deadlock
+# the child. 'spawn' is the fallback where forkserver is unavailable.
+WORKER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _file_extension(filename: str) -> str:
+    """Returns the lowercased extension of a filename, like Path.suffix.lower()."""
+    dot = filename.rfind('.')
+    # A leading dot marks a hidden file, not an extension (and dots in
+    # parent directory names don't count)
+    return filename[dot:].lower() if dot > filename.rfind('/') + 1 else ''
+
+
 def is_image_file(filename: str) -> bool:
     """Checks if a file has a supported image extension."""
-    return validate_file_extension(filename, IMAGE_EXTENSIONS)
+    return _file_extension(filename) in _IMAGE_EXTENSION_SET
 
 
 def is_video_file(filename: str) -> bool:
     """Checks if a file has a supported video extension."""
-    return validate_file_extension(filename, VIDEO_EXTENSIONS)
+    return _file_extension(filename) in _VIDEO_EXTENSION_SET
+
+
+def is_thumbnail_file(filename: str) -> bool:
+    """Checks if a file has the extension of a thumbnail or sprite sheet."""
+    return _file_extension(filename) in _THUMBNAIL_EXTENSION_SET
 
 
 def is_media_file(filename: str) -> bool:
     """Checks if a file is either an image or video."""
-    return is_image_file(filename) or is_video_file(filename)
+    return _file_extension(filename) in _MEDIA_TYPES
+
+
+def get_media_type(filename: str) -> Optional[str]:
+    """Returns 'image' or 'video' for supported media files, None otherwise."""
+    return _MEDIA_TYPES.get(_file_extension(filename))
+
+
+def _temporary_path(thumbnail_path: Path) -> Path:
+    """
+    Returns a unique temporary path next to a thumbnail.
+
+    Thumbnails are written to a temporary file and moved into place with
+    os.replace, so a concurrent request never serves a partially written
+    file. The extension is kept so the output format stays the same.
+    """
+    return thumbnail_path.with_name(f".{thumbnail_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp{thumbnail_path.suffix}")
+
+
+def _save_thumbnail(img: Image.Image, thumbnail_path: Path) -> None:
+    """Saves a PIL image to thumbnail_path atomically, encoded as THUMBNAIL_FORMAT."""
+    save_options = {}
+    thumbnail_format = config.get('THUMBNAIL_FORMAT')
+    if thumbnail_format in THUMBNAIL_FORMATS:
+        save_options = THUMBNAIL_FORMATS[thumbnail_format][1]
+        if thumbnail_format == 'jpeg' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')  # JPEG has no alpha or palette
+
+    temp_path = _temporary_path(thumbnail_path)
+    try:
+        img.save(temp_path, **save_options)
+        os.replace(temp_path, thumbnail_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def _make_thumbnail(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    Shrinks an image to fit within size, applying its EXIF orientation.
+
+    The orientation is applied after resizing, on the small image, with the
+    bounding box swapped for rotated photos so the result still fits size.
+
+    Args:
+        img: Opened PIL image
+        size: Tuple of (width, height) for the thumbnail
+
+    Returns:
+        Upright thumbnail image
+    """
+    # EXIF orientations 5-8 rotate the image by 90 or 270 degrees
+    orientation = img.getexif().get(0x0112, 1)
+    # thumbnail() first calls draft(), so libjpeg already decodes JPEGs at
+    # 1/2, 1/4 or 1/8 scale while keeping twice the target size for quality
+    img.thumbnail((size[1], size[0]) if orientation in (5, 6, 7, 8) else size)
+    return ImageOps.exif_transpose(img)
+
+
+def _create_thumbnail_vips(image_path: Path, thumbnail_path: Path, size: Tuple[int, int]) -> bool:
+    """
+    Generates a thumbnail using libvips.
+
+    Args:
+        image_path: Path to the original image
+        thumbnail_path: Path where the thumbnail should be saved
+        size: Tuple of (width, height) for the thumbnail
+
+    Returns:
+        bool: True if thumbnail was created successfully, False otherwise
+    """
+    temp_path = _temporary_path(thumbnail_path)
+    try:
+        # thumbnail() fuses decode, shrink-on-load, resize and EXIF rotation into
+        # one streaming pass. size='down' matches PIL: never upscale small images
+        thumbnail = pyvips.Image.thumbnail(str(image_path), size[0], height=size[1], size='down')
+        thumbnail_format = config.get('THUMBNAIL_FORMAT')
+        save_options = THUMBNAIL_FORMATS[thumbnail_format][2] if thumbnail_format in THUMBNAIL_FORMATS else {}
+        thumbnail.write_to_file(str(temp_path), **save_options)
+        os.replace(temp_path, thumbnail_path)
+        logging.debug(f"Generated thumbnail for {image_path} using libvips")
+        return True
+    except (pyvips.Error, OSError) as e:
+        logging.warning(f"libvips failed to process image {image_path}: {e}")
+        return False
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
 
 
-def get_or_create_thumbnail(image_path: Path, thumbnail_path: Path, size: Tuple[int, int]) -> bool:
+def get_or_create_thumbnail(image_path: Path, thumbnail_path: Path, size: Tuple[int, int], overwrite: bool = False) -> bool:
     """
     Generates a thumbnail for an image if it doesn't already exist.
+    The thumbnail's directory must already exist.
     
     Args:
         image_path: Path to the original image
         thumbnail_path: Path where the thumbnail should be saved
         size: Tuple of (width, height) for the thumbnail
+        overwrite: Regenerate the thumbnail even if it exists, e.g. when it is stale
         
     Returns:
         bool: True if thumbnail was created successfully, False otherwise
     """
-    thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
-    if thumbnail_path.exists():
+    if not overwrite and thumbnail_path.exists():
         return True  # Thumbnail already exists
+
+    backend = config.get('THUMBNAIL_BACKEND')
+    if backend in ('vips', 'auto') and pyvips is not None:
+        if _create_thumbnail_vips(image_path, thumbnail_path, size):
+            return True
+        # libvips builds differ in the formats they load (BMP in particular),
+        # so give PIL a chance before reporting a failure
+        logging.info(f"Retrying {image_path} with PIL")
+    elif backend == 'vips':
+        logging.warning("THUMBNAIL_BACKEND is 'vips' but pyvips is not available. Falling back to PIL.")
     
     try:
+        # Decode, resize and save in a single open; corrupt files raise here
         with Image.open(image_path) as img:
-            # Verify the image by attempting to load it fully
-            img.verify()
-            
-        # Re-open for processing (verify() closes the image)
-        with Image.open(image_path) as img:
-            img.thumbnail(size)
-            img.save(thumbnail_path)
+            _save_thumbnail(_make_thumbnail(img, size), thumbnail_path)
             logging.debug(f"Generated thumbnail for {image_path}")
             return True
             
@@ -71,8 +262,7 @@ def get_or_create_thumbnail(image_path: Path, thumbnail_path: Path, size: Tuple[
                 # Try to load the truncated image anyway
                 with Image.open(image_path) as img:
                     img.load()  # Force load what we can
-                    img.thumbnail(size)
-                    img.save(thumbnail_path)
+                    _save_thumbnail(_make_thumbnail(img, size), thumbnail_path)
                     logging.info(f"Successfully created thumbnail from truncated image: {image_path}")
                     return True
             except Exception as e2:
@@ -86,24 +276,25 @@ def get_or_create_thumbnail(image_path: Path, thumbnail_path: Path, size: Tuple[
         return False
 
 
-def get_or_create_video_thumbnail(video_path: Path, thumbnail_path: Path, size: Tuple[int, int]) -> bool:
+def get_or_create_video_thumbnail(video_path: Path, thumbnail_path: Path, size: Tuple[int, int], overwrite: bool = False) -> bool:
     """
     Generates a thumbnail for a video file using ffmpeg if it doesn't already exist.
+    The thumbnail's directory must already exist.
 
     Args:
         video_path: Path to the original video
         thumbnail_path: Path where the thumbnail should be saved
         size: Tuple of (width, height) for the thumbnail
+        overwrite: Regenerate the thumbnail even if it exists, e.g. when it is stale
 
     Returns:
         bool: True if thumbnail was created successfully, False otherwise
     """
-    thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
-    if thumbnail_path.exists():
+    if not overwrite and thumbnail_path.exists():
         return True  # Thumbnail already exists
 
     # Create a temporary file for the extracted frame
-    temp_frame = thumbnail_path.parent / f"{thumbnail_path.stem}_temp.jpg"
+    temp_frame = thumbnail_path.parent / f".{thumbnail_path.stem}.{os.getpid()}.{threading.get_ident()}_frame.jpg"
 
     try:
         # Extract frame at 1 second using ffmpeg
@@ -134,7 +325,7 @@ def get_or_create_video_thumbnail(video_path: Path, thumbnail_path: Path, size:
         if temp_frame.exists():
             with Image.open(temp_frame) as img:
                 img.thumbnail(size)
-                img.save(thumbnail_path)
+                _save_thumbnail(img, thumbnail_path)
 
             # Clean up temporary file
             temp_frame.unlink()
@@ -159,14 +350,285 @@ def get_or_create_video_thumbnail(video_path: Path, thumbnail_path: Path, size:
         return False
 
 
+def _thumbnail_is_fresh(media_path: str, thumbnail_path: str) -> bool:
+    """
+    Checks whether a thumbnail exists and is newer than its media file.
+
+    A photo replaced by an edited version keeps its name, so existence alone
+    would keep serving the old thumbnail. The media file is only stat'ed
+    when the thumbnail exists.
+    """
+    try:
+        thumbnail_mtime = os.stat(thumbnail_path).st_mtime_ns
+        return thumbnail_mtime >= os.stat(media_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _generate_thumbnail_task(task: Tuple[str, str, str, Tuple[int, int]]) -> Tuple[str, str, bool]:
+    """
+    Worker entry point used by the startup scan's process pool.
+
+    Args:
+        task: Tuple of (media_type, media_path, thumbnail_path, size), paths as strings
+
+    Returns:
+        Tuple of (media_path, thumbnail_path, success)
+    """
+    media_type, media_path, thumbnail_path, size = task
+    # The scan only queues thumbnails that are missing or stale
+    if media_type == 'video':
+        return media_path, thumbnail_path, get_or_create_video_thumbnail(Path(media_path), Path(thumbnail_path), size, overwrite=True)
+    return media_path, thumbnail_path, get_or_create_thumbnail(Path(media_path), Path(thumbnail_path), size, overwrite=True)
+
+
+def _generate_thumbnail_batch(tasks: List[Tuple[str, str, str, Tuple[int, int]]]) -> List[Tuple[str, str, bool]]:
+    """Worker entry point running several _generate_thumbnail_task calls."""
+    return [_generate_thumbnail_task(task) for task in tasks]
+
+
+def _generate_thumbnails(tasks: Iterable[Tuple[str, str, str, Tuple[int, int]]], workers: int) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Runs thumbnail tasks, yielding their results as they complete.
+
+    With several workers, tasks are taken from the iterable in batches and
+    only a bounded number of batches is in flight: the producer, typically
+    the directory walk, is paused until a batch completes. This keeps memory
+    flat on huge galleries and lets the caller report progress while the
+    walk is still going. No worker process starts if there are no tasks.
+
+    Args:
+        tasks: Iterable of (media_type, media_path, thumbnail_path, size)
+        workers: Number of worker processes; 1 runs the tasks in this process
+
+    Yields:
+        Tuples of (media_path, thumbnail_path, success), in completion order
+    """
+    if workers <= 1:
+        yield from map(_generate_thumbnail_task, tasks)
+        return
+
+    tasks = iter(tasks)
+    max_pending = workers * MAX_PENDING_BATCHES_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD)) as executor:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                batch = list(islice(tasks, TASK_BATCH_SIZE))
+                if not batch:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_generate_thumbnail_batch, batch))
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def is_sprite_sheet(thumbnail_filename: str) -> bool:
+    """Checks if a path relative to THUMBNAILS_DIR names a sprite sheet."""
+    return thumbnail_filename[thumbnail_filename.rfind('/') + 1:].startswith(f"{SPRITE_NAME}.")
+
+
+def load_album_sprite(album_thumbnail_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the sprite sheet metadata of an album.
+
+    The metadata holds 'version' (changes whenever the sheets are rebuilt),
+    'thumbnails' (the thumbnail names the sheets were built from), 'sheets'
+    (sheet filenames in the album's thumbnail directory) and 'tiles', which
+    maps thumbnail names to [sheet_index, x, y, width, height].
+
+    Args:
+        album_thumbnail_dir: Thumbnail directory of the album
+
+    Returns:
+        The metadata, or None if the album has no sprite sheets
+    """
+    try:
+        with open(f"{album_thumbnail_dir}/{SPRITE_NAME}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable sprite metadata in {album_thumbnail_dir}: {e}")
+        return None
+
+
+def create_album_sprite(album_thumbnail_dir: str, thumbnail_names: List[str], size: Tuple[int, int]) -> bool:
+    """
+    Builds the sprite sheets of an album from its existing thumbnails.
+
+    Each thumbnail is pasted at the top-left corner of a size-sized cell in a
+    grid, so its tile is found at (x, y) with the thumbnail's own dimensions.
+    Sheets are encoded like thumbnails (WebP with THUMBNAIL_FORMAT 'original')
+    and written atomically, followed by the metadata read by load_album_sprite.
+
+    Args:
+        album_thumbnail_dir: Thumbnail directory of the album
+        thumbnail_names: Names of the thumbnails to combine
+        size: THUMBNAIL_SIZE, the size of each grid cell
+
+    Returns:
+        True if the sprite sheets were written, False otherwise
+    """
+    extension = THUMBNAIL_FORMATS.get(config.get('THUMBNAIL_FORMAT'), THUMBNAIL_FORMATS['webp'])[0]
+    cell_width, cell_height = size
+    columns = max(1, MAX_SPRITE_SIZE // cell_width)
+    tiles_per_sheet = columns * max(1, MAX_SPRITE_SIZE // cell_height)
+    previous = load_album_sprite(album_thumbnail_dir)
+
+    sheets = []
+    tiles = {}
+    try:
+        for start in range(0, len(thumbnail_names), tiles_per_sheet):
+            names = thumbnail_names[start:start + tiles_per_sheet]
+            rows = (len(names) + columns - 1) // columns
+            sheet = Image.new('RGBA', (min(columns, len(names)) * cell_width, rows * cell_height))
+
+            for index, name in enumerate(names):
+                x = (index % columns) * cell_width
+                y = (index // columns) * cell_height
+                try:
+                    with Image.open(f"{album_thumbnail_dir}/{name}") as thumbnail:
+                        if thumbnail.width > cell_width or thumbnail.height > cell_height:
+                            continue  # Made with a larger THUMBNAIL_SIZE, keep serving it alone
+                        sheet.paste(thumbnail.convert('RGBA'), (x, y))
+                        tiles[name] = [len(sheets), x, y, thumbnail.width, thumbnail.height]
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Leaving {name} out of the sprite sheet of {album_thumbnail_dir}: {e}")
+
+            sheet_name = f"{SPRITE_NAME}.{len(sheets)}{extension}"
+            _save_thumbnail(sheet, Path(album_thumbnail_dir) / sheet_name)
+            sheets.append(sheet_name)
+
+        metadata_path = Path(album_thumbnail_dir) / f"{SPRITE_NAME}.json"
+        temp_path = _temporary_path(metadata_path)
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': time.time_ns(), 'thumbnails': thumbnail_names, 'sheets': sheets, 'tiles': tiles}, f, separators=(',', ':'))
+            os.replace(temp_path, metadata_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+    except OSError as e:
+        logging.error(f"Error creating sprite sheets for {album_thumbnail_dir}: {e}")
+        return False
+
+    # Drop sheets left over from a larger version of the album
+    if previous:
+        for sheet_name in previous.get('sheets', []):
+            if sheet_name not in sheets:
+                try:
+                    os.unlink(f"{album_thumbnail_dir}/{sheet_name}")
+                except OSError:
+                    pass
+
+    return True
+
+
+def _create_album_sprite_task(task: Tuple[str, List[str], Tuple[int, int]]) -> Tuple[str, bool]:
+    """
+    Worker entry point used by the startup scan to build sprite sheets.
+
+    Args:
+        task: Tuple of (album_thumbnail_dir, thumbnail_names, size)
+
+    Returns:
+        Tuple of (album_thumbnail_dir, success)
+    """
+    album_thumbnail_dir, thumbnail_names, size = task
+    return album_thumbnail_dir, create_album_sprite(album_thumbnail_dir, thumbnail_names, size)
+
+
+def _update_album_sprites(albums: List[Tuple[str, List[str]]], regenerated_thumbnails: Set[str], failed_thumbnails: Set[str], size: Tuple[int, int], workers: int) -> None:
+    """
+    Rebuilds the sprite sheets of albums whose thumbnails changed.
+
+    Args:
+        albums: (album_thumbnail_dir, thumbnail_names) of every album with media
+        regenerated_thumbnails: Paths of thumbnails generated by this scan
+        failed_thumbnails: Paths of thumbnails that could not be generated
+        size: THUMBNAIL_SIZE
+        workers: Number of processes to use
+    """
+    tasks = []
+    for album_thumbnail_dir, thumbnail_names in albums:
+        names = sorted((name for name in thumbnail_names if f"{album_thumbnail_dir}/{name}" not in failed_thumbnails), key=str.lower)
+        if len(names) < 2:
+            continue  # Nothing to combine
+        sprite = load_album_sprite(album_thumbnail_dir)
+        if sprite is None or sprite.get('thumbnails') != names or any(f"{album_thumbnail_dir}/{name}" in regenerated_thumbnails for name in names):
+            tasks.append((album_thumbnail_dir, names, size))
+
+    if not tasks:
+        return
+
+    logging.info(f"Building sprite sheets for {len(tasks)} album(s)")
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=multiprocessing.get_context(WORKER_START_METHOD)) as executor:
+            results = list(executor.map(_create_album_sprite_task, tasks))
+    else:
+        results = [_create_album_sprite_task(task) for task in tasks]
+
+    failed = [album_thumbnail_dir for album_thumbnail_dir, success in results if not success]
+    if failed:
+        logging.warning(f"Failed to build sprite sheets for {len(failed)} album(s)")
+
+
+def _acquire_scan_lock(thumbnails_root: Path) -> Optional[Any]:
+    """
+    Takes the lock that lets a single process run the startup scan.
+
+    Every Gunicorn worker creates the application, and so starts a scan.
+    Without the lock, each of them would spawn its own pool of WORKERS
+    processes to generate the same thumbnails.
+
+    Returns:
+        The open lock file, to be closed once the scan is done, or None if
+        another process holds the lock
+    """
+    thumbnails_root.mkdir(parents=True, exist_ok=True)
+    lock_file = open(thumbnails_root / '.scan.lock', 'a')
+    if fcntl is None:
+        return lock_file  # No advisory locks on this platform
+
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
 def scan_and_generate_all_thumbnails() -> None:
     """
     Scans the PHOTOS_DIR for all images and videos and generates missing thumbnails.
-    This runs at application startup.
+    This runs at application startup. Thumbnails are generated in a pool of
+    WORKERS processes since decoding and resizing is CPU-bound. When several
+    processes start at once, only the first one scans.
     """
+    lock_file = _acquire_scan_lock(config.get('THUMBNAILS_DIR'))
+    if lock_file is None:
+        logging.info("Another process is already running the thumbnail scan, skipping it")
+        return
+
+    try:
+        _scan_and_generate_all_thumbnails()
+    finally:
+        lock_file.close()
+
+
+def _scan_and_generate_all_thumbnails() -> None:
+    """Walks PHOTOS_DIR and generates missing thumbnails, see scan_and_generate_all_thumbnails."""
     photos_root = config.get('PHOTOS_DIR')
     thumbnails_root = config.get('THUMBNAILS_DIR')
     thumbnail_size = config.get('THUMBNAIL_SIZE')
+    workers = config.get('WORKERS', 1)
 
     logging.info(f"Starting initial thumbnail generation scan for '{photos_root}'")
 
@@ -175,48 +637,77 @@ def scan_and_generate_all_thumbnails() -> None:
         return
 
     thumbnails_root.mkdir(parents=True, exist_ok=True)  # Ensure root thumbnail dir exists
+    thumbnails_root_str = str(thumbnails_root)
 
     total_media = 0
     total_images = 0
     total_videos = 0
     successful_thumbnails = 0
     failed_media = []
+    regenerated_thumbnails = set()
+    failed_thumbnails = set()
+    scanned_dirs = []
+    # (album_thumbnail_dir, thumbnail_names) of every album with media
+    albums = []
+
+    def pending_thumbnails():
+        """Walks the tree, yielding a task for each missing or stale thumbnail."""
+        nonlocal total_media, total_images, total_videos, successful_thumbnails
+
+        # Unchanged directories are listed from the persistent scan cache
+        for dirpath, relative_path, dirnames, filenames in walk_photos():
+            scanned_dirs.append(relative_path)
+            album_thumbnail_dir = None
+            thumbnail_names = []
+
+            # Plain strings keep Path allocations out of this per-file loop;
+            # walk_tree only yields regular files, so no is_file() is needed either
+            for filename in filenames:
+                media_type = get_media_type(filename)
+                if media_type is None:
+                    continue
+
+                if album_thumbnail_dir is None:
+                    album_thumbnail_dir = thumbnails_root_str if relative_path == '.' else f"{thumbnails_root_str}/{relative_path}"
+                    os.makedirs(album_thumbnail_dir, exist_ok=True)  # Ensure album thumbnail dir exists
+
+                total_media += 1
+                if media_type == 'image':
+                    total_images += 1
+                else:
+                    total_videos += 1
 
-    for dirpath, dirnames, filenames in os.walk(photos_root):
-        current_dir_images = [f for f in filenames if is_image_file(f)]
-        current_dir_videos = [f for f in filenames if is_video_file(f)]
-
-        if current_dir_images or current_dir_videos:
-            relative_path = Path(dirpath).relative_to(photos_root)
-            album_thumbnail_dir = thumbnails_root / relative_path
-            album_thumbnail_dir.mkdir(parents=True, exist_ok=True)  # Ensure album thumbnail dir exists
+                thumbnail_name = get_thumbnail_name(filename)
+                thumbnail_names.append(thumbnail_name)
+                thumbnail_path = f"{album_thumbnail_dir}/{thumbnail_name}"
+                media_path = f"{dirpath}/{filename}"
+                if _thumbnail_is_fresh(media_path, thumbnail_path):
+                    successful_thumbnails += 1  # No need to ship it to a worker
+                else:
+                    yield media_type, media_path, thumbnail_path, thumbnail_size
+
+            if thumbnail_names:
+                albums.append((album_thumbnail_dir, thumbnail_names))
+
+    logging.info(f"Generating any missing or outdated thumbnails using {workers} worker(s)")
+    # The workers encode thumbnails while the walk is still reading
+    # directories, and progress is reported as batches complete
+    results = _generate_thumbnails(pending_thumbnails(), workers)
+    for done, (media_path, thumbnail_path, success) in enumerate(results, 1):
+        if success:
+            successful_thumbnails += 1
+            regenerated_thumbnails.add(thumbnail_path)
+        else:
+            failed_media.append(media_path)
+            failed_thumbnails.add(thumbnail_path)
+        if done % PROGRESS_INTERVAL == 0:
+            logging.info(f"Generated {done} thumbnails")
 
-            # Process images
-            for photo_filename in current_dir_images:
-                photo_path = Path(dirpath) / photo_filename
-                thumbnail_path = album_thumbnail_dir / photo_filename
+    scan_cache.retain(scanned_dirs)
+    scan_cache.save()
 
-                if photo_path.is_file():
-                    total_media += 1
-                    total_images += 1
-                    if get_or_create_thumbnail(photo_path, thumbnail_path, thumbnail_size):
-                        successful_thumbnails += 1
-                    else:
-                        failed_media.append(str(photo_path))
-
-            # Process videos
-            for video_filename in current_dir_videos:
-                video_path = Path(dirpath) / video_filename
-                # Video thumbnails are saved as .jpg
-                thumbnail_path = album_thumbnail_dir / f"{Path(video_filename).stem}.jpg"
-
-                if video_path.is_file():
-                    total_media += 1
-                    total_videos += 1
-                    if get_or_create_video_thumbnail(video_path, thumbnail_path, thumbnail_size):
-                        successful_thumbnails += 1
-                    else:
-                        failed_media.append(str(video_path))
+    if config.get('ALBUM_SPRITES'):
+        _update_album_sprites(albums, regenerated_thumbnails, failed_thumbnails, thumbnail_size, workers)
     
     # Summary logging
     if total_media > 0:
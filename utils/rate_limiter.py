@@ -2,6 +2,7 @@
 """Rate limiting utilities for pygallery."""
 
 import time
+import threading
 from collections import defaultdict, deque
 from functools import wraps
 from typing import Dict, Deque, Tuple, Callable, Any
@@ -16,6 +17,8 @@ class RateLimiter:
         self.requests: Dict[str, Deque[float]] = defaultdict(deque)
         # Store rate limit rules: endpoint -> (requests_per_minute, window_seconds)
         self.rules: Dict[str, Tuple[int, int]] = {}
+        # Threaded workers check limits concurrently for the same client
+        self.lock = threading.Lock()
     
     def add_rule(self, endpoint: str, requests_per_minute: int, window_seconds: int = 60):
         """
@@ -45,25 +48,26 @@ class RateLimiter:
         max_requests, window_seconds = self.rules[endpoint]
         current_time = time.time()
         
-        # Clean old requests outside the window
-        client_requests = self.requests[client_ip]
-        while client_requests and client_requests[0] < current_time - window_seconds:
-            client_requests.popleft()
-        
-        # Check if under limit
-        if len(client_requests) < max_requests:
-            client_requests.append(current_time)
-            return True, {
-                'limit': max_requests,
-                'remaining': max_requests - len(client_requests),
-                'reset_time': current_time + window_seconds
-            }
-        else:
-            return False, {
-                'limit': max_requests,
-                'remaining': 0,
-                'reset_time': client_requests[0] + window_seconds
-            }
+        with self.lock:
+            # Clean old requests outside the window
+            client_requests = self.requests[client_ip]
+            while client_requests and client_requests[0] < current_time - window_seconds:
+                client_requests.popleft()
+            
+            # Check if under limit
+            if len(client_requests) < max_requests:
+                client_requests.append(current_time)
+                return True, {
+                    'limit': max_requests,
+                    'remaining': max_requests - len(client_requests),
+                    'reset_time': current_time + window_seconds
+                }
+            else:
+                return False, {
+                    'limit': max_requests,
+                    'remaining': 0,
+                    'reset_time': client_requests[0] + window_seconds
+                }
 
 
 # Global rate limiter instance
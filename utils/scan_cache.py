@@ -0,0 +1,127 @@
+"""Persistent directory listing cache for pygallery."""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from config.settings import config
+
+# Bump when the on-disk layout changes so stale caches are discarded
+CACHE_VERSION = 1
+
+# Directories modified this recently are not cached: another change within
+# the same mtime tick would otherwise go unnoticed.
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+
+class ScanCache:
+    """
+    Cache of directory listings keyed by relative path and directory mtime.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so an unchanged mtime means the cached listing is still
+    valid and the directory does not need to be read again. The cache is
+    persisted as JSON so that restarts only rescan directories that changed;
+    call load() once logging is configured to pick up the saved state.
+    """
+
+    def __init__(self, cache_file: Optional[Path], root: Path):
+        self.cache_file = cache_file
+        # Listings are keyed by paths relative to this directory
+        self.root = str(root)
+        # relative_path -> {'mtime_ns': int, 'dirs': [...], 'files': [...]}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        # Incremented whenever a directory is found to have changed, so callers
+        # can cheaply tell whether anything derived from the tree is stale
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        """Loads the cache from disk, starting empty if it is missing or unreadable."""
+        if not self.cache_file or not self.cache_file.is_file():
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable scan cache {self.cache_file}: {e}")
+            return
+
+        if data.get('version') != CACHE_VERSION:
+            logging.info("Scan cache version changed, starting from an empty cache")
+            return
+
+        # A copied tree keeps its directory mtimes, so listings saved for
+        # another PHOTOS_DIR could look valid
+        if data.get('root') != self.root:
+            logging.info("PHOTOS_DIR changed, starting from an empty scan cache")
+            return
+
+        self.entries = data.get('entries', {})
+        logging.info(f"Loaded scan cache with {len(self.entries)} directories")
+
+    def save(self) -> None:
+        """Writes the cache to disk atomically if it changed since the last save."""
+        if not self.cache_file or not self.dirty:
+            return
+
+        temp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.lock:
+                payload = json.dumps({'version': CACHE_VERSION, 'root': self.root, 'entries': self.entries}, separators=(',', ':'))
+                self.dirty = False
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            logging.error(f"Unable to write scan cache {self.cache_file}: {e}")
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def lookup(self, relative_path: str, mtime_ns: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Returns the cached (dirnames, filenames) for a directory if still valid.
+
+        Args:
+            relative_path: Directory path relative to the walked root
+            mtime_ns: Current st_mtime_ns of the directory
+
+        Returns:
+            Copies of the cached lists, or None if the directory must be read
+        """
+        entry = self.entries.get(relative_path)
+        if entry is None or entry['mtime_ns'] != mtime_ns:
+            return None
+        return list(entry['dirs']), list(entry['files'])
+
+    def store(self, relative_path: str, mtime_ns: int, dirnames: List[str], filenames: List[str]) -> None:
+        """Records the listing of a directory that was just read."""
+        with self.lock:
+            self.generation += 1
+            if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+                self.entries.pop(relative_path, None)
+                return
+            self.entries[relative_path] = {'mtime_ns': mtime_ns, 'dirs': list(dirnames), 'files': list(filenames)}
+            self.dirty = True
+
+    def retain(self, relative_paths: Iterable[str]) -> None:
+        """Drops entries for directories that no longer exist after a full walk."""
+        keep = set(relative_paths)
+        with self.lock:
+            stale = [path for path in self.entries if path not in keep]
+            for path in stale:
+                del self.entries[path]
+            if stale:
+                self.generation += 1
+                self.dirty = True
+
+
+# Global scan cache instance
+scan_cache = ScanCache(config.get('SCAN_CACHE_FILE'), config.get('PHOTOS_DIR'))
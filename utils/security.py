@@ -3,6 +3,7 @@
 
 import os
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Union
 from urllib.parse import unquote
@@ -125,6 +126,19 @@ def validate_filename(filename: str) -> str:
     return validate_path_component(decoded)
 
 
+@lru_cache(maxsize=None)
+def _resolve_base(base_path: Path) -> Path:
+    """
+    Resolves a base directory once per process.
+
+    Only PHOTOS_DIR and THUMBNAILS_DIR are passed here, so the cache stays
+    tiny. Joined paths are still resolved on every call: a cached result
+    would keep trusting a path after one of its directories was replaced
+    by a symlink pointing outside the base.
+    """
+    return base_path.resolve()
+
+
 def safe_path_join(base_path: Path, path_string: str) -> Path:
     """
     Safely join a path string to base_path, ensuring result is within base_path.
@@ -159,7 +173,7 @@ def safe_path_join(base_path: Path, path_string: str) -> Path:
     # Resolve the path to handle any remaining .. or . components
     try:
         resolved_path = result_path.resolve()
-        resolved_base = base_path.resolve()
+        resolved_base = _resolve_base(base_path)
         
         # Check if resolved path is within base directory
         resolved_path.relative_to(resolved_base)
@@ -171,27 +185,6 @@ def safe_path_join(base_path: Path, path_string: str) -> Path:
         raise SecurityError(f"Path resolution error: {str(e)}")
 
 
-def validate_file_extension(filename: str, allowed_extensions: tuple) -> bool:
-    """
-    Validate file extension against allowed extensions.
-    
-    Args:
-        filename: The filename to check
-        allowed_extensions: Tuple of allowed extensions (e.g., ('.jpg', '.png'))
-        
-    Returns:
-        True if extension is allowed, False otherwise
-    """
-    if not filename:
-        return False
-    
-    # Get file extension in lowercase
-    file_ext = Path(filename).suffix.lower()
-    
-    # Check if extension is in allowed list
-    return file_ext in allowed_extensions
-
-
 def sanitize_error_message(message: str) -> str:
     """
     Sanitize error message to prevent information disclosure.
@@ -0,0 +1,26 @@
+"""JSON serialization utilities for pygallery."""
+
+import json
+from typing import Any
+
+# orjson is a much faster C implementation; fall back to the standard
+# library when it is not installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json(data: Any) -> bytes:
+    """
+    Serializes data to compact UTF-8 encoded JSON.
+
+    Args:
+        data: JSON-serializable data
+
+    Returns:
+        JSON document as bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')